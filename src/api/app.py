@@ -1,23 +1,59 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from pathlib import Path
+from typing import List
+from collections import deque
+import csv
+import threading
+import numpy as np
 import pandas as pd
 import joblib
+import time
 from datetime import datetime
+from functools import lru_cache
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, OrdinalEncoder
+
+try:  # optional: serve the Day 5 ONNX export instead of the sklearn pipeline
+    import onnxruntime as ort
+except ImportError:
+    ort = None
 
 # Paths
 MODEL_FILE = Path("models/attack_model.pkl")
+ONNX_FILE = Path("models/attack_model.onnx")
 ALERTS_FILE = Path("reports/live_alerts.csv")
 
+# Live alerts tail (newest rows of live_alerts.csv kept in memory)
+MAX_ALERTS = 1000
+TAIL_POLL_SECONDS = 0.5
+TAIL_START_BYTES = 1_000_000   # on (re)load only the end of the file is parsed
+# live_alerts.csv columns with a numeric type; every other column stays a string
+ALERT_COLUMN_TYPES = {"status_code": int, "risk_score": int, "ml_probability": float}
+
+# /detect_batch size limits (empty batches are rejected with 422)
+MAX_BATCH_ITEMS = 1000
+
 app = FastAPI(
     title="WSO2 API Shield",
     description="AI-powered API attack detection (WSO2 API Gateway style)",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Load model at startup
 model = None
 
+# Cached feature layout of the fitted ColumnTransformer (see build_encoder)
+encoder = None
+
+# onnxruntime session over models/attack_model.onnx (if exported by Day 5)
+session = None
+
+alerts_buf = deque(maxlen=MAX_ALERTS)
+alerts_lock = threading.Lock()
+tail_state = {"inode": None, "offset": 0, "header": None, "sig": b""}
+
 # ✅ Features expected by model (must match Day 5)
 FEATURE_COLS = [
     "api_name", "http_method", "resource", "status_code",
@@ -26,6 +62,13 @@ FEATURE_COLS = [
     "burst_flag", "scan_flag", "auth_abuse_flag",
     "attack_risk_score"
 ]
+CATEGORICAL_COLS = ["api_name", "http_method", "resource"]
+
+# Suggested actions (WSO2 style): ACTIONS[i] applies from ACTION_THRESHOLDS[i - 1] up
+ACTION_THRESHOLDS = np.array([0.70, 0.85, 0.95])
+ACTIONS = np.array([
+    "ALLOW", "TEMP_RATE_LIMIT_MONITOR", "THROTTLE_AND_STEPUP_AUTH", "BLOCK_IP_AND_REVOKE_TOKEN"
+])
 
 class DetectRequest(BaseModel):
     api_name: str = Field(..., example="UserAPI")
@@ -45,6 +88,9 @@ class DetectRequest(BaseModel):
 
     attack_risk_score: int = Field(..., example=95)
 
+class DetectBatchRequest(BaseModel):
+    items: List[DetectRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
 class DetectResponse(BaseModel):
     attack_probability: float
     predicted_attack: bool
@@ -52,57 +98,231 @@ class DetectResponse(BaseModel):
     model_version: str
     timestamp: str
 
+def build_encoder(pipe):
+    """Cache the fitted Ordinal/OneHot/passthrough layout so /detect can skip the ColumnTransformer."""
+    # the fast path feeds the final estimator directly -> only valid for exactly prep -> model
+    if len(pipe.steps) != 2:
+        return None
+    prep = pipe.named_steps["prep"]
+    onehot_maps, ordinal_maps, num_cols = [], [], []
+    width = 0
+
+    for name, trans, cols in prep.transformers_:
+        if name == "remainder" and trans == "drop":
+            continue
+        # fitted "passthrough" shows up as an identity FunctionTransformer
+        if trans == "passthrough" or (isinstance(trans, FunctionTransformer) and trans.func is None):
+            for col in cols:
+                num_cols.append((col, width))
+                width += 1
+        elif (isinstance(trans, OrdinalEncoder) and trans.handle_unknown == "use_encoded_value"
+              and trans.max_categories is None and trans.min_frequency is None):
+            for col, categories in zip(cols, trans.categories_):
+                codes = {value: i for i, value in enumerate(categories)}
+                ordinal_maps.append((col, width, codes, trans.unknown_value))
+                width += 1
+        elif (isinstance(trans, OneHotEncoder) and trans.drop is None
+              and trans.max_categories is None and trans.min_frequency is None):
+            for col, categories in zip(cols, trans.categories_):
+                onehot_maps.append((col, {value: width + i for i, value in enumerate(categories)}))
+                width += len(categories)
+        else:
+            # Unknown layout -> fall back to the full sklearn pipeline
+            return None
+
+    return width, onehot_maps, ordinal_maps, num_cols
+
+def featurize(items):
+    """Build the exact matrix the final estimator expects, straight from request fields."""
+    width, onehot_maps, ordinal_maps, num_cols = encoder
+    X = np.zeros((len(items), width), dtype=np.float32)
+
+    for i, it in enumerate(items):
+        vals = it.__dict__
+        for col, j, codes, unknown in ordinal_maps:
+            X[i, j] = codes.get(vals[col], unknown)
+        for col, lookup in onehot_maps:
+            j = lookup.get(vals[col])
+            if j is not None:  # unseen category -> all zeros (handle_unknown="ignore")
+                X[i, j] = 1.0
+        for col, j in num_cols:
+            X[i, j] = vals[col]
+
+    return X
+
+def onnx_feeds(items):
+    """One [n, 1] input tensor per feature, as typed in Day 5's ONNX export."""
+    rows = [it.__dict__ for it in items]
+    return {
+        col: np.array(
+            [[r[col]] for r in rows],
+            dtype=object if col in CATEGORICAL_COLS else np.float32
+        )
+        for col in FEATURE_COLS
+    }
+
+@lru_cache(maxsize=1)
+def iso_second(epoch_second):
+    return datetime.utcfromtimestamp(epoch_second).isoformat()
+
+def utc_timestamp():
+    """UTC ISO timestamp, formatted at most once per second."""
+    return iso_second(int(time.time()))
+
 @app.on_event("startup")
 def startup_event():
-    global model
+    global model, encoder, session
     if not MODEL_FILE.exists():
         print("❌ Model not found:", MODEL_FILE)
         model = None
         return
 
     model = joblib.load(MODEL_FILE)
+    # request batches are small: a thread fan-out per call would cost more than it saves
+    model.steps[-1][1].n_jobs = None
+    encoder = build_encoder(model)
     print("✅ Model loaded:", MODEL_FILE)
 
+    if ort is not None and ONNX_FILE.exists():
+        session = ort.InferenceSession(str(ONNX_FILE), providers=["CPUExecutionProvider"])
+        print("✅ ONNX Runtime session loaded:", ONNX_FILE)
+
 @app.get("/health")
 def health():
     return {
         "status": "ok",
         "service": "WSO2 API Shield",
         "model_loaded": model is not None,
-        "time": datetime.utcnow().isoformat()
+        "time": utc_timestamp()
     }
 
-@app.post("/detect", response_model=DetectResponse)
-def detect_attack(req: DetectRequest):
+def detect_batch_rows(items):
+    """Score many requests with a single predict_proba call."""
+    timestamp = utc_timestamp()
+
     if model is None:
-        return {
+        return [{
             "attack_probability": 0.0,
             "predicted_attack": False,
             "suggested_action": "MODEL_NOT_LOADED",
             "model_version": "none",
-            "timestamp": datetime.utcnow().isoformat()
-        }
-
-    X = pd.DataFrame([req.dict()])[FEATURE_COLS]
-    prob = float(model.predict_proba(X)[0][1])
-    predicted = prob >= 0.5
-
-    # Suggested action logic (WSO2 style)
-    if prob >= 0.95:
-        action = "BLOCK_IP_AND_REVOKE_TOKEN"
-    elif prob >= 0.85:
-        action = "THROTTLE_AND_STEPUP_AUTH"
-    elif prob >= 0.70:
-        action = "TEMP_RATE_LIMIT_MONITOR"
+            "timestamp": timestamp
+        } for _ in items]
+
+    # report which backend actually scored the request
+    model_version = MODEL_FILE.name
+    if session is not None:
+        # float32 tree sums can overshoot 1.0 by an ulp or two
+        probs = np.clip(session.run(["probabilities"], onnx_feeds(items))[0][:, 1], 0.0, 1.0)
+        model_version = ONNX_FILE.name
+    elif encoder is not None:
+        probs = model.steps[-1][1].predict_proba(featurize(items))[:, 1]
     else:
-        action = "ALLOW"
+        rows = [it.__dict__ for it in items]
+        X = pd.DataFrame(rows, columns=FEATURE_COLS)
+        probs = model.predict_proba(X)[:, 1]
 
+    # Suggested action logic (WSO2 style): bucket probabilities by threshold
+    actions = ACTIONS[np.searchsorted(ACTION_THRESHOLDS, probs, side="right")]
+
+    return [{
+        "attack_probability": float(prob),
+        "predicted_attack": bool(prob >= 0.5),
+        "suggested_action": str(action),
+        "model_version": model_version,
+        "timestamp": timestamp
+    } for prob, action in zip(probs, actions)]
+
+# Responses are built from trusted values -> skip response_model re-validation
+@app.post("/detect", responses={200: {"model": DetectResponse}})
+def detect_attack(req: DetectRequest):
+    return ORJSONResponse(detect_batch_rows([req])[0])
+
+@app.post("/detect_batch", responses={200: {"model": List[DetectResponse]}})
+def detect_attack_batch(req: DetectBatchRequest):
+    return ORJSONResponse(detect_batch_rows(req.items))
+
+def parse_value(value, cast):
+    """Typed by column (not guessed per cell) so a field always has one JSON type."""
+    if value == "":
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        return None
+
+def poll_alerts():
+    """Parse only the lines appended to live_alerts.csv since the last poll."""
+    if not ALERTS_FILE.exists():
+        return
+
+    stat = ALERTS_FILE.stat()
+    state = tail_state
+
+    with open(ALERTS_FILE, "rb") as f:
+        # Day 6 rewrites the file -> detect truncation / replacement and start over
+        rewritten = stat.st_ino != state["inode"] or stat.st_size < state["offset"]
+        if not rewritten and state["sig"]:
+            f.seek(state["offset"] - len(state["sig"]))
+            rewritten = f.read(len(state["sig"])) != state["sig"]
+
+        if rewritten:
+            state.update(inode=stat.st_ino, offset=0, header=None, sig=b"")
+            with alerts_lock:
+                alerts_buf.clear()
+
+        if state["header"] is None:
+            f.seek(0)
+            header_line = f.readline()
+            if not header_line.endswith(b"\n"):
+                return
+            state["header"] = next(csv.reader([header_line.decode("utf-8", errors="ignore")]))
+            state["offset"] = max(f.tell(), stat.st_size - TAIL_START_BYTES)
+            if state["offset"] > f.tell():
+                f.seek(state["offset"] - 1)
+                f.readline()  # skip the partial row we landed in
+                state["offset"] = f.tell()
+
+        f.seek(state["offset"])
+        chunk = f.read(stat.st_size - state["offset"])
+
+    end = chunk.rfind(b"\n") + 1  # keep a half-written last row for the next poll
+    if end == 0:
+        return
+
+    lines = chunk[:end].decode("utf-8", errors="ignore").splitlines()
+    header = state["header"]
+    casts = [ALERT_COLUMN_TYPES.get(name, str) for name in header]
+    records = [dict(zip(header, map(parse_value, row, casts))) for row in csv.reader(lines) if row]
+
+    with alerts_lock:
+        alerts_buf.extend(records)
+    state["offset"] += end
+    state["sig"] = chunk[max(0, end - 64):end]
+
+def tail_alerts():
+    while True:
+        try:
+            poll_alerts()
+        except OSError:
+            pass
+        time.sleep(TAIL_POLL_SECONDS)
+
+@app.on_event("startup")
+def start_alerts_tail():
+    poll_alerts()
+    threading.Thread(target=tail_alerts, daemon=True).start()
+
+@lru_cache(maxsize=4)
+def load_alert_stats(mtime_ns, size):
+    """Parse live_alerts.csv once per file version and precompute the /stats counts."""
+    # multi-threaded pyarrow parser, only the three columns /stats reports on
+    df = pd.read_csv(ALERTS_FILE, engine="pyarrow", usecols=["client_ip", "resource", "suggested_action"])
     return {
-        "attack_probability": prob,
-        "predicted_attack": bool(predicted),
-        "suggested_action": action,
-        "model_version": "attack_model.pkl",
-        "timestamp": datetime.utcnow().isoformat()
+        "total_alerts": len(df),
+        "top_attacker_ips": df["client_ip"].value_counts().head(10).to_dict(),
+        "top_attacked_endpoints": df["resource"].value_counts().head(10).to_dict(),
+        "action_distribution": df["suggested_action"].value_counts().to_dict()
     }
 
 @app.get("/alerts")
@@ -110,11 +330,11 @@ def get_alerts(limit: int = 20):
     if not ALERTS_FILE.exists():
         return {"alerts": [], "message": "No live_alerts.csv found. Run Day 6 streaming first."}
 
-    df = pd.read_csv(ALERTS_FILE)
-    df = df.tail(limit)
+    with alerts_lock:
+        alerts = list(alerts_buf)[-limit:] if limit > 0 else []
     return {
-        "total_alerts": len(df),
-        "alerts": df.to_dict(orient="records")
+        "total_alerts": len(alerts),
+        "alerts": alerts
     }
 
 @app.get("/stats")
@@ -122,15 +342,6 @@ def stats():
     if not ALERTS_FILE.exists():
         return {"message": "No live_alerts.csv found. Run Day 6 streaming first."}
 
-    df = pd.read_csv(ALERTS_FILE)
-
-    top_ips = df["client_ip"].value_counts().head(10).to_dict()
-    top_endpoints = df["resource"].value_counts().head(10).to_dict()
-    actions = df["suggested_action"].value_counts().to_dict()
-
-    return {
-        "total_alerts": len(df),
-        "top_attacker_ips": top_ips,
-        "top_attacked_endpoints": top_endpoints,
-        "action_distribution": actions
-    }
+    # (mtime, size) changes whenever Day 6 rewrites the file
+    stat = ALERTS_FILE.stat()
+    return load_alert_stats(stat.st_mtime_ns, stat.st_size)
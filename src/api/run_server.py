@@ -1,4 +1,5 @@
 import uvicorn
 
 if __name__ == "__main__":
-    uvicorn.run("src.api.app:app", host="127.0.0.1", port=8000, reload=False)
+    # loop/http "auto" pick uvloop + httptools whenever they are installed
+    uvicorn.run("src.api.app:app", host="127.0.0.1", port=8000, reload=False, loop="auto", http="auto")
@@ -4,6 +4,7 @@ from pathlib import Path
 import plotly.express as px
 import requests
 import json
+import time
 
 st.set_page_config(
     page_title="WSO2 API Shield - SOC Dashboard",
@@ -26,31 +27,54 @@ limit = st.sidebar.slider("Alerts limit", 10, 500, 100)
 
 use_api = st.sidebar.checkbox("Use FastAPI backend (/alerts, /stats)", value=False)
 
+# loaders below are cached; the refresh button forces a reload
+if refresh:
+    st.cache_data.clear()
+
 # -----------------------------
-# Load alerts
+# Load alerts (cached: Streamlit reruns this script on every interaction)
 # -----------------------------
-def load_alerts_from_csv():
-    if not ALERTS_FILE.exists():
+@st.cache_data(ttl=5)
+def load_alerts_from_csv(limit, mtime_ns):
+    # mtime_ns is only part of the cache key -> re-read when Day 6 rewrites the file
+    if not mtime_ns:
         return pd.DataFrame()
-    df = pd.read_csv(ALERTS_FILE)
+    df = pd.read_csv(ALERTS_FILE, engine="pyarrow")
     return df.tail(limit)
 
-def load_alerts_from_api():
+@st.cache_data(ttl=5)
+def load_alerts_from_api(api_url, limit, tick):
     try:
-        r = requests.get(f"{API_URL}/alerts?limit={limit}", timeout=5)
+        r = requests.get(f"{api_url}/alerts?limit={limit}", timeout=5)
         data = r.json()
         return pd.DataFrame(data.get("alerts", []))
     except Exception:
         return pd.DataFrame()
 
-def load_stats_from_api():
+@st.cache_data(ttl=5)
+def load_stats_from_api(api_url, tick):
     try:
-        r = requests.get(f"{API_URL}/stats", timeout=5)
+        r = requests.get(f"{api_url}/stats", timeout=5)
         return r.json()
     except Exception:
         return {}
 
-alerts_df = load_alerts_from_api() if use_api else load_alerts_from_csv()
+@st.cache_data
+def count_by(alerts, column, label, top=None):
+    counts = alerts[column].value_counts()
+    if top:
+        counts = counts.head(top)
+    counts = counts.reset_index()
+    counts.columns = [label, "count"]
+    return counts
+
+def alerts_mtime():
+    return ALERTS_FILE.stat().st_mtime_ns if ALERTS_FILE.exists() else 0
+
+# API calls are re-made at most once per 5-second tick
+tick = int(time.time() // 5)
+
+alerts_df = load_alerts_from_api(API_URL, limit, tick) if use_api else load_alerts_from_csv(limit, alerts_mtime())
 
 # -----------------------------
 # If no alerts
@@ -77,22 +101,19 @@ st.divider()
 left, right = st.columns(2)
 
 # Top attacker IPs
-top_ips = alerts_df["client_ip"].value_counts().head(10).reset_index()
-top_ips.columns = ["client_ip", "count"]
+top_ips = count_by(alerts_df, "client_ip", "client_ip", top=10)
 
 fig_ips = px.bar(top_ips, x="client_ip", y="count", title="Top Attacker IPs (Top 10)")
 left.plotly_chart(fig_ips, use_container_width=True)
 
 # Top attacked endpoints
-top_endpoints = alerts_df["resource"].value_counts().head(10).reset_index()
-top_endpoints.columns = ["resource", "count"]
+top_endpoints = count_by(alerts_df, "resource", "resource", top=10)
 
 fig_endpoints = px.bar(top_endpoints, x="resource", y="count", title="Top Attacked Endpoints (Top 10)")
 right.plotly_chart(fig_endpoints, use_container_width=True)
 
 # Action distribution
-actions = alerts_df["suggested_action"].value_counts().reset_index()
-actions.columns = ["action", "count"]
+actions = count_by(alerts_df, "suggested_action", "action")
 fig_actions = px.pie(actions, values="count", names="action", title="Suggested Action Distribution")
 st.plotly_chart(fig_actions, use_container_width=True)
 
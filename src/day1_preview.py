@@ -5,16 +5,27 @@ DATA_DIR = Path("data")
 
 SKIP_FILES = {"anomaly_labels.txt", "abnormal_label.txt", "normal_label.txt"}
 
+def walk_files(root):
+    # os.scandir entries carry the file type, so no extra stat() per path
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
 def list_log_files(root: Path, max_files=20):
     files = []
-    for path in root.rglob("*"):
-        if path.is_file():
-            name = path.name.lower()
-            if name in SKIP_FILES:
-                continue
-            if name.endswith(".log") or name.endswith(".txt"):
-                files.append(path)
-    return files[:max_files], len(files)
+    total = 0
+    for entry in walk_files(root):
+        name = entry.name.lower()
+        if name in SKIP_FILES:
+            continue
+        if name.endswith((".log", ".txt")):
+            total += 1
+            if len(files) < max_files:
+                files.append(Path(entry.path))
+    return files, total
 
 def read_first_lines(file_path: Path, n=10):
     try:
@@ -1,5 +1,10 @@
 import random
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 from datetime import datetime, timedelta
 
@@ -7,7 +12,7 @@ RAW_DIR = Path("data")
 OUT_DIR = Path("data/processed")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-OUTPUT_FILE = OUT_DIR / "wso2_api_logs.csv"
+OUTPUT_FILE = OUT_DIR / "wso2_api_logs.parquet"
 
 SKIP_FILES = {"anomaly_labels.txt", "abnormal_label.txt", "normal_label.txt", "anomaly_label.txt"}
 
@@ -41,8 +46,25 @@ USER_AGENTS = [
 ATTACKER_IPS = ["91.210.10.4", "91.210.10.5", "185.33.22.1"]
 NORMAL_IPS = [f"{random.randint(10, 200)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}" for _ in range(500)]
 
-def random_timestamp(start_time):
-    return start_time + timedelta(seconds=random.randint(0, 60 * 60 * 24))
+ATTACK_TYPES = ["burst", "scan", "auth_abuse"]
+ATTACK_METHODS = ["GET", "POST"]
+ATTACK_ENDPOINTS = ["/user/login", "/admin/metrics", "/admin/health"]
+ATTACK_USER_AGENTS = ["curl/8.0.1", "python-requests/2.31.0"]
+NORMAL_STATUS = [200, 201, 202, 204]
+ATTACK_STATUS = [401, 403, 429, 500]  # bad status for attack
+
+# Sampling tables: built once, sampled by integer index (object dtype so rows can be overwritten freely)
+APIS_NP = np.array(APIS, dtype=object)
+METHODS_NP = np.array(METHODS, dtype=object)
+ENDPOINTS_NP = np.array(ENDPOINTS, dtype=object)
+USER_AGENTS_NP = np.array(USER_AGENTS, dtype=object)
+ATTACKER_IPS_NP = np.array(ATTACKER_IPS, dtype=object)
+ATTACK_TYPES_NP = np.array(ATTACK_TYPES, dtype=object)
+ATTACK_METHODS_NP = np.array(ATTACK_METHODS, dtype=object)
+ATTACK_ENDPOINTS_NP = np.array(ATTACK_ENDPOINTS, dtype=object)
+ATTACK_USER_AGENTS_NP = np.array(ATTACK_USER_AGENTS, dtype=object)
+NORMAL_STATUS_NP = np.array(NORMAL_STATUS)
+ATTACK_STATUS_NP = np.array(ATTACK_STATUS)
 
 def read_log_lines(log_file: Path, max_lines=200):
     lines = []
@@ -58,71 +80,91 @@ def read_log_lines(log_file: Path, max_lines=200):
         pass
     return lines
 
-def generate_normal_record(line, ts, file_name):
-    api_name, api_version = random.choice(APIS)
-    endpoint = random.choice(ENDPOINTS)
-    method = random.choice(METHODS)
+def pick(rng, table, size):
+    return table[rng.integers(0, len(table), size)]
 
-    latency = max(10, int(random.gauss(220, 70)))
-    payload = max(60, int(random.gauss(900, 250)))
+def generate_file_records(lines, file_name, start_time, rng, normal_ips):
+    """Generate all records for one raw log file in a few vectorized NumPy draws.
 
-    status = random.choice([200, 201, 202, 204])
+    Each raw line becomes either 1 normal record or an attack session of 30-80
+    records from the SAME attacker IP in the same 10-sec window.
+    """
+    n = len(lines)
 
-    return {
-        "timestamp": ts.strftime("%Y-%m-%d %H:%M:%S"),
-        "api_name": api_name,
-        "api_version": api_version,
+    # 80% normal, 20% attack sessions (per raw line)
+    line_attack = rng.random(n) < 0.20
+    session_size = np.where(line_attack, rng.integers(30, 81, n), 1)
+    line_type = pick(rng, ATTACK_TYPES_NP, n)
+    line_ip = pick(rng, ATTACKER_IPS_NP, n)
+    line_api = rng.integers(0, len(APIS_NP), n)
+    line_offset = rng.integers(0, 60 * 60 * 24 + 1, n)
+
+    # expand per-line values to per-record values
+    idx = np.repeat(np.arange(n), session_size)
+    attack = line_attack[idx]
+    attack_type = line_type[idx]
+    rows = len(idx)
+    n_attack = int(attack.sum())
+
+    offset = line_offset[idx]
+    offset[attack] += rng.integers(0, 10, n_attack)  # same 10-sec window
+    # real datetimes (whole seconds) -> Parquet stores an integer timestamp column
+    timestamps = pd.Timestamp(start_time).floor("s") + pd.to_timedelta(offset, unit="s")
+
+    apis = APIS_NP[line_api[idx]]
+
+    # draw normal values for every row, then overwrite only the attack rows
+    method = pick(rng, METHODS_NP, rows)
+    method[attack] = pick(rng, ATTACK_METHODS_NP, n_attack)
+
+    endpoint = pick(rng, ENDPOINTS_NP, rows)  # scans keep the many unique endpoints
+    targeted = attack & (attack_type != "scan")
+    endpoint[targeted] = pick(rng, ATTACK_ENDPOINTS_NP, int(targeted.sum()))
+
+    status = pick(rng, NORMAL_STATUS_NP, rows)
+    status[attack] = pick(rng, ATTACK_STATUS_NP, n_attack)
+
+    client_ip = pick(rng, normal_ips, rows)
+    client_ip[attack] = line_ip[idx[attack]]
+
+    user_agent = pick(rng, USER_AGENTS_NP, rows)
+    user_agent[attack] = pick(rng, ATTACK_USER_AGENTS_NP, n_attack)
+
+    latency = rng.normal(220, 70, rows)
+    latency[attack] = rng.normal(900, 250, n_attack)
+    latency = np.maximum(np.where(attack, 50, 10), latency.astype(np.int64))
+
+    payload = rng.normal(900, 250, rows)
+    payload[attack] = rng.normal(1800, 500, n_attack)
+    payload = np.maximum(np.where(attack, 200, 60), payload.astype(np.int64))
+
+    raw_lines = np.array([line[:250] for line in lines], dtype=object)[idx]
+    raw_lines[attack] = "[ATTACK:" + attack_type[attack] + "] simulated event"
+
+    return pd.DataFrame({
+        "timestamp": timestamps,
+        "api_name": apis[:, 0],
+        "api_version": apis[:, 1],
         "http_method": method,
         "resource": endpoint,
-        "status_code": status,
-        "latency_ms": latency,
-        "payload_size": payload,
-        "client_ip": random.choice(NORMAL_IPS),
-        "user_agent": random.choice(USER_AGENTS),
+        "status_code": status.astype(np.int16),
+        "latency_ms": latency.astype(np.int32),
+        "payload_size": payload.astype(np.int32),
+        "client_ip": client_ip,
+        "user_agent": user_agent,
         "raw_source": file_name,
-        "anomaly_label": 0,
-        "raw_line": line[:250],
-    }
-
-def generate_attack_records(base_ts, file_name, attack_type="burst"):
-    """Generate a small attack session from SAME attacker IP in same time window."""
-    attacker_ip = random.choice(ATTACKER_IPS)
-    api_name, api_version = random.choice(APIS)
-
-    records = []
-    session_size = random.randint(30, 80)
-
-    for i in range(session_size):
-        ts = base_ts + timedelta(seconds=random.randint(0, 9))  # same 10-sec window
-        method = random.choice(["GET", "POST"])
-
-        if attack_type == "scan":
-            endpoint = random.choice(ENDPOINTS)  # many unique endpoints
-        else:
-            endpoint = random.choice(["/user/login", "/admin/metrics", "/admin/health"])
-
-        # bad status for attack
-        status = random.choice([401, 403, 429, 500])
-
-        latency = max(50, int(random.gauss(900, 250)))
-        payload = max(200, int(random.gauss(1800, 500)))
-
-        records.append({
-            "timestamp": ts.strftime("%Y-%m-%d %H:%M:%S"),
-            "api_name": api_name,
-            "api_version": api_version,
-            "http_method": method,
-            "resource": endpoint,
-            "status_code": status,
-            "latency_ms": latency,
-            "payload_size": payload,
-            "client_ip": attacker_ip,
-            "user_agent": random.choice(["curl/8.0.1", "python-requests/2.31.0"]),
-            "raw_source": file_name,
-            "anomaly_label": 1,
-            "raw_line": f"[ATTACK:{attack_type}] simulated event",
-        })
-    return records
+        "anomaly_label": attack.astype(np.int8),
+        "raw_line": raw_lines,
+    })
+
+def process_file(path: Path, start_time, normal_ips):
+    lines = read_log_lines(path, max_lines=120)
+    if not lines:
+        return None
+
+    # fresh OS entropy per file -> workers never share a random stream
+    rng = np.random.default_rng()
+    return generate_file_records(lines, path.name, start_time, rng, normal_ips)
 
 def main():
     start_time = datetime.now() - timedelta(days=10)
@@ -143,30 +185,33 @@ def main():
 
     print(f"✅ Found {len(raw_files)} raw files. Building WSO2 dataset...")
 
-    all_logs = []
+    label_counts = pd.Series(0, index=[1, 0])
 
-    for file in raw_files[:300]:  # limit processing for speed
-        lines = read_log_lines(file, max_lines=120)
-        if not lines:
-            continue
+    # files are independent -> build them in parallel, write in order
+    # (NORMAL_IPS is passed along so spawned workers share the same IP pool)
+    worker = partial(process_file, start_time=start_time, normal_ips=np.array(NORMAL_IPS, dtype=object))
 
-        for line in lines:
-            ts = random_timestamp(start_time)
+    writer = None
+    with ProcessPoolExecutor() as ex:
+        for df in ex.map(worker, raw_files[:300], chunksize=8):  # limit processing for speed
+            if df is None:
+                continue
 
-            # 80% normal, 20% attack sessions
-            if random.random() < 0.20:
-                attack_type = random.choice(["burst", "scan", "auth_abuse"])
-                all_logs.extend(generate_attack_records(ts, file.name, attack_type))
-            else:
-                all_logs.append(generate_normal_record(line, ts, file.name))
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(OUTPUT_FILE, table.schema, compression="snappy")
+            writer.write_table(table)
+            label_counts = label_counts.add(df["anomaly_label"].value_counts(), fill_value=0)
 
-    df = pd.DataFrame(all_logs)
-    df.to_csv(OUTPUT_FILE, index=False)
+    if writer is None:
+        print("❌ No log lines found in the raw files.")
+        return
+    writer.close()
 
-    print("\n✅ Created wso2_api_logs.csv with attack sessions!")
+    print("\n✅ Created wso2_api_logs.parquet with attack sessions!")
     print("📌 Saved:", OUTPUT_FILE)
     print("\n✅ anomaly_label distribution:")
-    print(df["anomaly_label"].value_counts())
+    print(label_counts.astype(int).rename_axis("anomaly_label").rename("count"))
 
 if __name__ == "__main__":
     main()
@@ -2,14 +2,14 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.preprocessing import FunctionTransformer, OrdinalEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.ensemble import IsolationForest
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib
 
-DATA_FILE = Path("data/processed/wso2_api_logs.csv")
+DATA_FILE = Path("data/processed/wso2_api_logs.parquet")
 MODEL_DIR = Path("models")
 REPORT_DIR = Path("reports")
 
@@ -17,19 +17,26 @@ MODEL_DIR.mkdir(exist_ok=True)
 REPORT_DIR.mkdir(exist_ok=True)
 
 MODEL_FILE = MODEL_DIR / "isoforest.pkl"
-PRED_FILE = REPORT_DIR / "anomaly_predictions.csv"
+PRED_FILE = REPORT_DIR / "anomaly_predictions.parquet"
 
 def main():
     if not DATA_FILE.exists():
         print("❌ Missing dataset:", DATA_FILE)
-        print("Run Day 2 first to generate wso2_api_logs.csv")
+        print("Run Day 2 first to generate wso2_api_logs.parquet")
         return
 
-    df = pd.read_csv(DATA_FILE)
+    # only the columns this model needs (Parquet reads them without touching the rest)
+    df = pd.read_parquet(DATA_FILE, engine="pyarrow", columns=[
+        "timestamp", "api_name", "http_method", "resource", "status_code",
+        "latency_ms", "payload_size", "user_agent", "client_ip", "anomaly_label"
+    ])
 
-    # Basic cleanup
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    df = df.dropna(subset=["timestamp"])
+    # compact dtypes: repeated strings -> category, small ints -> int16/int32
+    df = df.astype({
+        "api_name": "category", "http_method": "category", "resource": "category",
+        "user_agent": "category", "client_ip": "category",
+        "status_code": "int16", "latency_ms": "int32", "payload_size": "int32"
+    })
 
     # New engineered features
     df["hour"] = df["timestamp"].dt.hour
@@ -38,7 +45,8 @@ def main():
 
     # Convert IP to simple features
     # Example: "120.4.100.9" -> first_octet=120
-    df["ip_first_octet"] = df["client_ip"].astype(str).str.split(".").str[0].astype(int)
+    # (on a category column .str runs once per unique IP, not once per row)
+    df["ip_first_octet"] = df["client_ip"].str.extract(r"^(\d+)", expand=False).astype(np.uint8)
 
     # Select features
     feature_cols = [
@@ -58,7 +66,8 @@ def main():
 
     preprocessor = ColumnTransformer(
         transformers=[
-            ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_features),
+            # trees split fine on integer codes -> no one-hot blow-up
+            ("cat", OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1), categorical_features),
             ("num", "passthrough", numerical_features),
         ]
     )
@@ -72,6 +81,7 @@ def main():
 
     pipe = Pipeline([
         ("prep", preprocessor),
+        ("float32", FunctionTransformer(np.asarray, kw_args={"dtype": np.float32})),  # dense float32 for the trees
         ("model", model)
     ])
 
@@ -94,10 +104,10 @@ def main():
     out = df.copy()
     out["predicted_anomaly"] = y_pred
     out["anomaly_score"] = pipe.named_steps["model"].score_samples(
-        pipe.named_steps["prep"].transform(X)
+        pipe[:-1].transform(X)
     )
 
-    out.to_csv(PRED_FILE, index=False)
+    out.to_parquet(PRED_FILE, engine="pyarrow", compression="snappy", index=False)
     print(f"✅ Predictions saved: {PRED_FILE}")
 
     # Show top suspicious
@@ -1,17 +1,25 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 import joblib
 import matplotlib.pyplot as plt
 
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.preprocessing import OrdinalEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
 from sklearn.ensemble import RandomForestClassifier
 
-DATA_FILE = Path("data/processed/wso2_api_logs_enriched.csv")
+try:  # optional: ONNX export for the API's onnxruntime fast path
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType, StringTensorType
+except ImportError:
+    convert_sklearn = None
+
+DATA_FILE = Path("data/processed/wso2_api_logs_enriched.parquet")
 
 MODEL_DIR = Path("models")
 REPORT_DIR = Path("reports")
@@ -22,31 +30,51 @@ REPORT_DIR.mkdir(exist_ok=True)
 FIG_DIR.mkdir(parents=True, exist_ok=True)
 
 MODEL_FILE = MODEL_DIR / "attack_model.pkl"
-PRED_FILE = REPORT_DIR / "ml_attack_predictions.csv"
+ONNX_FILE = MODEL_DIR / "attack_model.onnx"
+ONNX_OPSET = 17
+PRED_FILE = REPORT_DIR / "ml_attack_predictions.parquet"
+PRED_CHUNK_ROWS = 200_000
+
+# Day 4 risk scores outside this band are decisive -> the model is only run inside it
+RISK_CLEAR_BELOW = 30  # 0 -> probability 0.0
+RISK_ATTACK_FROM = 90  # 100 -> probability 1.0
 
 def save_fig(path: Path):
     plt.tight_layout()
     plt.savefig(path)
     plt.close()
 
-def main():
-    if not DATA_FILE.exists():
-        print("❌ Missing enriched dataset:", DATA_FILE)
-        print("Run Day 4 first.")
-        return
+def export_onnx(pipe, feature_cols, categorical):
+    """Export the fitted pipeline (preprocessing + RF) as one ONNX graph for onnxruntime."""
+    # never leave an ONNX file from an older model next to the new .pkl
+    ONNX_FILE.unlink(missing_ok=True)
 
-    df = pd.read_csv(DATA_FILE)
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    df = df.dropna(subset=["timestamp"])
+    if convert_sklearn is None:
+        print("⚠️ skl2onnx not installed -> skipping ONNX export")
+        return
 
-    # target
-    y = df["attack_detected"].astype(int)
+    initial_types = [
+        (c, StringTensorType([None, 1]) if c in categorical else FloatTensorType([None, 1]))
+        for c in feature_cols
+    ]
+    try:
+        onx = convert_sklearn(
+            pipe,
+            initial_types=initial_types,
+            options={id(pipe.named_steps["model"]): {"zipmap": False}},  # plain probability tensor
+            target_opset=ONNX_OPSET
+        )
+    except Exception as e:
+        print(f"⚠️ ONNX export failed: {e}")
+        return
 
-    print("✅ attack_detected distribution:")
-    print(y.value_counts())
+    ONNX_FILE.write_bytes(onx.SerializeToString())
+    print(f"✅ ONNX model saved: {ONNX_FILE}")
 
-    if y.nunique() < 2:
-        print("\n❌ Only ONE class found. Re-run Day 4 (attack generation).")
+def main():
+    if not DATA_FILE.exists():
+        print("❌ Missing enriched dataset:", DATA_FILE)
+        print("Run Day 4 first.")
         return
 
     # ✅ IMPORTANT: updated feature columns based on Day 4 output
@@ -57,28 +85,48 @@ def main():
         "burst_flag", "scan_flag", "auth_abuse_flag",
         "attack_risk_score"
     ]
+    # features + target + the fields the reports print; nothing else is read from disk
+    load_cols = ["timestamp", "client_ip", *feature_cols, "attack_detected"]
 
-    # Make sure columns exist
-    missing = [c for c in feature_cols if c not in df.columns]
+    # Make sure columns exist (the Parquet footer is enough to check)
+    missing = [c for c in load_cols if c not in pq.read_schema(DATA_FILE).names]
     if missing:
         print("❌ Missing columns:", missing)
         print("Please re-run Day 4 to regenerate enriched dataset correctly.")
         return
 
+    df = pd.read_parquet(DATA_FILE, engine="pyarrow", columns=load_cols)
+
+    # target
+    y = df["attack_detected"].astype(int)
+
+    print("✅ attack_detected distribution:")
+    print(y.value_counts())
+
+    if y.nunique() < 2:
+        print("\n❌ Only ONE class found. Re-run Day 4 (attack generation).")
+        return
+
     X = df[feature_cols].copy()
 
     categorical = ["api_name", "http_method", "resource"]
     numeric = [c for c in feature_cols if c not in categorical]
+    # float32 is what the trees use internally -> no float64 copy during fit
+    X[numeric] = X[numeric].astype(np.float32)
 
     preprocessor = ColumnTransformer(
         transformers=[
-            ("cat", OneHotEncoder(handle_unknown="ignore"), categorical),
+            # one integer code per column instead of a wide one-hot block; trees split on it fine
+            ("cat", OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1), categorical),
             ("num", "passthrough", numeric),
-        ]
+        ],
+        sparse_threshold=0  # always hand the forest a dense matrix
     )
 
     model = RandomForestClassifier(
         n_estimators=250,
+        max_features="sqrt",
+        n_jobs=-1,  # trees are independent -> build/predict on all cores
         random_state=42,
         class_weight="balanced"
     )
@@ -113,18 +161,33 @@ def main():
     except Exception:
         print("⚠️ ROC-AUC not available")
 
-    # save model
-    joblib.dump(pipe, MODEL_FILE)
+    # save model (uncompressed -> the API loads it without a decompression pass)
+    joblib.dump(pipe, MODEL_FILE, compress=0)
     print(f"\n✅ Model saved: {MODEL_FILE}")
-
-    # Full dataset predictions
-    full_probs = pipe.predict_proba(X)[:, 1]
-    out = df.copy()
-    out["ml_attack_probability"] = full_probs
-    out["ml_attack_predicted"] = (full_probs >= 0.5).astype(int)
-
-    out.to_csv(PRED_FILE, index=False)
-    print(f"✅ ML predictions saved: {PRED_FILE}")
+    export_onnx(pipe, feature_cols, categorical)
+
+    # Full dataset predictions, scored and written chunk by chunk (no full copy of df)
+    risk = X["attack_risk_score"].to_numpy()
+    ambiguous = (risk >= RISK_CLEAR_BELOW) & (risk < RISK_ATTACK_FROM)
+    full_probs = np.empty(len(X))
+    writer = None
+    for start in range(0, len(X), PRED_CHUNK_ROWS):
+        stop = start + PRED_CHUNK_ROWS
+        probs = np.where(risk[start:stop] >= RISK_ATTACK_FROM, 1.0, 0.0)
+        mask = ambiguous[start:stop]
+        if mask.any():
+            probs[mask] = pipe.predict_proba(X.iloc[start:stop][mask])[:, 1]
+        full_probs[start:stop] = probs
+
+        table = pa.Table.from_pandas(df.iloc[start:stop], preserve_index=False)
+        table = table.append_column("ml_attack_probability", pa.array(probs))
+        table = table.append_column("ml_attack_predicted", pa.array((probs >= 0.5).astype(np.int8)))
+        if writer is None:
+            writer = pq.ParquetWriter(PRED_FILE, table.schema, compression="snappy")
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+    print(f"✅ ML predictions saved: {PRED_FILE} (model scored {ambiguous.sum()} of {len(X)} rows)")
 
     # Plot 1: Risk score distribution
     plt.figure()
@@ -135,11 +198,13 @@ def main():
     save_fig(FIG_DIR / "risk_score_distribution.png")
 
     # Plot 2: Top attacked endpoints (based on ML predicted)
-    top_endpoints = (
-        out[out["ml_attack_predicted"] == 1]["resource"]
-        .value_counts()
-        .head(10)
+    # one bincount over the category codes of the flagged rows
+    resource = df["resource"].astype("category")
+    counts = np.bincount(
+        resource.cat.codes.to_numpy()[full_probs >= 0.5],
+        minlength=len(resource.cat.categories)
     )
+    top_endpoints = pd.Series(counts, index=resource.cat.categories).nlargest(10)
 
     plt.figure()
     top_endpoints.plot(kind="bar")
@@ -153,11 +218,15 @@ def main():
     print(" - top_attacked_endpoints.png")
 
     print("\n🔥 Top 10 suspicious events (highest probability):")
-    print(out.sort_values("ml_attack_probability", ascending=False).head(10)[
+    # O(N) top-k, then sort just those k rows
+    k = min(10, len(full_probs))
+    top = np.argpartition(-full_probs, k - 1)[:k]
+    top = top[np.argsort(-full_probs[top], kind="stable")]
+    print(df.iloc[top][
         ["timestamp", "client_ip", "api_name", "http_method", "resource",
          "status_code", "req_count_bucket", "unique_endpoints_bucket", "auth_fails_bucket",
-         "attack_risk_score", "ml_attack_probability"]
-    ])
+         "attack_risk_score"]
+    ].assign(ml_attack_probability=full_probs[top]))
 
 if __name__ == "__main__":
     main()
